@@ -1,8 +1,9 @@
 import streamlit as st
-from data.fetch import get_transactions, get_deposits_divs
-from data.history_logic import get_historic
-from data.portfolio import calculate_portfolio, calculate_cash, calculate_div
-from visualizations.charts import show_allocation_chart, show_graph_deposits, show_graph_div, show_portfolio, show_graph_development
+from data.fetch import get_transactions
+from data.aggregates import get_cash_balance, get_dividend_totals, mark_aggregates_stale
+from data.history_logic import get_historic, get_historic_accounts
+from data.portfolio import calculate_portfolio, with_accounts, ACCOUNT_COLUMN
+from visualizations.charts import show_allocation_chart, show_graph_deposits, show_graph_div, show_portfolio, show_graph_development, show_account_totals
 from data.submit import submit_transaction_form, submit_deposits_divs_form
 
 
@@ -10,28 +11,45 @@ from data.submit import submit_transaction_form, submit_deposits_divs_form
 st.set_page_config(page_title="itry", layout="wide")
 st.title("lets try")
 
+# load transactions first, so the transaction form can offer the existing accounts
+df = with_accounts(get_transactions())
+all_accounts = sorted(df[ACCOUNT_COLUMN].unique().tolist())
+
 # Allow for updating transactions & deposits
-submit_transaction_form()
+submit_transaction_form(all_accounts)
 submit_deposits_divs_form()
 
-# load transaction, deposits, dividends
-df = get_transactions()
-df_div = get_deposits_divs()
-cash_df = calculate_cash(df_div)
+# Resync the cashflow aggregates on demand, e.g. after editing transactions_div by hand
+if st.sidebar.button("🔄 Rebuild cashflow aggregates"):
+    mark_aggregates_stale()
+
+# load deposits, dividends
+cash_df = get_cash_balance()
 history = get_historic(df, cash_df)
+account_history = get_historic_accounts()
 
 
 if df.empty:
     st.warning("No transactions found in Supabase.")
 else:
     # Add filter
+    selected_accounts = all_accounts
+    if len(all_accounts) > 1:
+        selected_accounts = st.sidebar.multiselect("Filter by account", all_accounts, default=all_accounts)
     all_tickers = df["ticker"].unique().tolist()
     selected_tickers = st.sidebar.multiselect("Filter by ticker", all_tickers, default=all_tickers)
-    filtered_df = df[df["ticker"].isin(selected_tickers)]
+    filtered_df = df[df["ticker"].isin(selected_tickers) & df[ACCOUNT_COLUMN].isin(selected_accounts)]
 
     # Logic
-    portfolio_df, total_value = calculate_portfolio(filtered_df)
-    dividends = calculate_div(df_div)
+    portfolio_df, total_value, accounts_df = calculate_portfolio(filtered_df)
+    dividends = get_dividend_totals()
+
+    throttled = portfolio_df.loc[portfolio_df["Status"] == "throttled", "Ticker"].tolist() if not portfolio_df.empty else []
+    if throttled:
+        st.warning(f"⚠️ Market data provider is throttling requests, prices incomplete for: {', '.join(throttled)}")
+    no_change = portfolio_df.loc[portfolio_df["Change Status"] == "throttled", "Ticker"].tolist() if not portfolio_df.empty else []
+    if no_change:
+        st.warning(f"⚠️ Market data provider is throttling requests, 1d change unavailable for: {', '.join(no_change)}")
 
     # Start dashboard
     portfolio_change = show_portfolio(portfolio_df)
@@ -41,9 +59,11 @@ else:
         delta=f"{round(portfolio_change, 2)}%"
     )
 
+    show_account_totals(accounts_df)
+
     # Plot
     show_allocation_chart(portfolio_df)
     show_graph_deposits(cash_df)
-    show_graph_development(history, cash_df)
+    show_graph_development(history, cash_df, account_history, selected_accounts)
     show_graph_div(dividends)
 
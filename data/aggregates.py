@@ -0,0 +1,206 @@
+"""
+Running cashflow aggregates, materialized in Supabase next to `historic_data`
+(see supabase/migrations for the table definitions):
+
+    cash_balance     (date PK, amount, cumulative_total)       net deposits per day
+    dividend_totals  (ticker, year, currency unique, gross, tax, net)
+    aggregate_sync   (name PK, source_rows)                    what they were built from
+
+They are updated incrementally by `apply_cashflow` whenever a row is added
+through the form, so the charts no longer re-aggregate the full history.
+Rows added or deleted outside the form (e.g. in the Supabase console) are caught by
+comparing the row count of `transactions_div` with the count stored in
+`aggregate_sync`; on a mismatch both tables are rebuilt. The count lives in
+Supabase, so a restart costs two small queries rather than a rebuild. Rows
+edited in place don't change the count and are not detected: use the
+"Rebuild cashflow aggregates" button after editing by hand. If the tables
+don't exist yet, the charts fall back to aggregating `transactions_div` directly.
+"""
+import threading
+
+import pandas as pd
+import streamlit as st
+from supabase_client import supabase
+from data.fetch import get_deposits_divs
+from data.portfolio import calculate_cash, calculate_div
+
+CASH_TYPES = ["Deposit", "Withdrawal"]
+DIV_TYPES = ["Dividend Gross", "Dividend Tax"]
+CASH_COLUMNS = ["date", "amount", "cumulative_total"]
+DIV_COLUMNS = ["ticker", "year", "currency", "gross", "tax", "net"]
+SYNC_NAME = "cashflow"
+
+
+@st.cache_resource
+def _write_lock():
+    # Sessions are threads of one process, so this serializes all their updates.
+    # Reentrant, so the form can hold it across the insert and the update.
+    return threading.RLock()
+
+
+def cashflow_lock():
+    return _write_lock()
+
+
+def build_cash_balance(df_div):
+    if df_div.empty:
+        return pd.DataFrame(columns=CASH_COLUMNS)
+    cash_df = calculate_cash(df_div)
+    amounts = pd.to_numeric(cash_df["amount"], errors="coerce").fillna(0)
+    daily = amounts.groupby(cash_df["date"].dt.strftime("%Y-%m-%d")).sum()
+    return pd.DataFrame({
+        "date": daily.index,
+        "amount": daily.values.round(2),
+        "cumulative_total": daily.cumsum().values.round(2)
+    })
+
+
+def build_dividend_totals(df_div):
+    if df_div.empty:
+        return pd.DataFrame(columns=DIV_COLUMNS)
+    div_df = calculate_div(df_div)
+    div_df["year"] = pd.to_datetime(div_df["date"]).dt.year
+    totals = div_df.pivot_table(index=["ticker", "year", "currency"], columns="type",
+                                values="amount", aggfunc="sum", fill_value=0)
+    totals = totals.reindex(columns=DIV_TYPES, fill_value=0).rename(
+        columns={"Dividend Gross": "gross", "Dividend Tax": "tax"}
+    )
+    totals["net"] = totals["gross"] + totals["tax"]
+    totals = totals.round(2).reset_index()
+    totals.columns.name = None
+    return totals.astype({"year": int})
+
+
+def _count_source_rows():
+    return supabase.table("transactions_div").select("date", count="exact").limit(1).execute().count
+
+
+def _synced_rows():
+    """Row count the aggregates reflect, or None when they must be rebuilt."""
+    data = supabase.table("aggregate_sync").select("source_rows").eq("name", SYNC_NAME).execute().data
+    return data[0]["source_rows"] if data else None
+
+
+def _store_synced_rows(count):
+    supabase.table("aggregate_sync").upsert({"name": SYNC_NAME, "source_rows": count}, on_conflict="name").execute()
+
+
+def _replace(table, records, keys):
+    """Make `table` hold exactly `records`: upsert them, then delete rows no longer present."""
+    if records:
+        supabase.table(table).upsert(records, on_conflict=",".join(keys)).execute()
+    fresh = {tuple(r[k] for k in keys) for r in records}
+    existing = supabase.table(table).select(",".join(keys)).execute().data
+    for row in existing:
+        if tuple(row[k] for k in keys) not in fresh:
+            query = supabase.table(table).delete()
+            for k in keys:
+                query = query.eq(k, row[k])
+            query.execute()
+
+
+def rebuild_aggregates():
+    """Recompute both tables from a fresh (uncached) read of `transactions_div`."""
+    with _write_lock():
+        df_div = pd.DataFrame(supabase.table("transactions_div").select("*").execute().data)
+        _replace("cash_balance", build_cash_balance(df_div).to_dict("records"), ["date"])
+        _replace("dividend_totals", build_dividend_totals(df_div).to_dict("records"),
+                 ["ticker", "year", "currency"])
+        _store_synced_rows(len(df_div))
+    print("✅ Cashflow aggregates rebuilt.")
+
+
+def sync_aggregates():
+    """Rebuild when transactions_div changed outside apply_cashflow (or after a failed update)."""
+    with _write_lock():
+        if _synced_rows() != _count_source_rows():
+            rebuild_aggregates()
+
+
+def mark_aggregates_stale():
+    """Force a rebuild on the next read (in every instance), e.g. after apply_cashflow failed."""
+    try:
+        _store_synced_rows(None)
+    except Exception as e:
+        print(f"⚠️ Could not mark cashflow aggregates stale: {e}")
+    get_cash_balance.clear()
+    get_dividend_totals.clear()
+
+
+def _apply_cash(date, amount):
+    # Only rows on or after the new date shift, usually just today's
+    later = supabase.table("cash_balance").select("*").gte("date", date).execute().data
+    rows = {r["date"]: r for r in later}
+    if date not in rows:
+        prev = (supabase.table("cash_balance").select("cumulative_total")
+                .lt("date", date).order("date", desc=True).limit(1).execute().data)
+        base = float(prev[0]["cumulative_total"]) if prev else 0.0
+        rows[date] = {"date": date, "amount": 0.0, "cumulative_total": base}
+
+    for row in rows.values():
+        row["cumulative_total"] = round(float(row["cumulative_total"]) + amount, 2)
+    rows[date]["amount"] = round(float(rows[date]["amount"]) + amount, 2)
+    supabase.table("cash_balance").upsert(list(rows.values())).execute()
+
+
+def _apply_dividend(ticker, date, currency, amount, div_type):
+    year = int(date[:4])
+    existing = (supabase.table("dividend_totals").select("*")
+                .eq("ticker", ticker).eq("year", year).eq("currency", currency).execute().data)
+    row = existing[0] if existing else {"ticker": ticker, "year": year, "currency": currency,
+                                        "gross": 0.0, "tax": 0.0, "net": 0.0}
+    column = "gross" if div_type == "Dividend Gross" else "tax"
+    row[column] = round(float(row[column]) + amount, 2)
+    row["net"] = round(float(row["gross"]) + float(row["tax"]), 2)
+    supabase.table("dividend_totals").upsert(row, on_conflict="ticker,year,currency").execute()
+
+
+def apply_cashflow(record):
+    """Fold one freshly inserted `transactions_div` record into the aggregates."""
+    amount = float(record["amount"])
+    with _write_lock():
+        if record["type"] in CASH_TYPES:
+            _apply_cash(record["date"], amount)
+        elif record["type"] in DIV_TYPES:
+            _apply_dividend(record["ticker"], record["date"], record["currency"], amount, record["type"])
+        # A concurrent write elsewhere makes the count mismatch, which just triggers a rebuild
+        synced = _synced_rows()
+        if synced is not None:
+            _store_synced_rows(synced + 1)
+    get_cash_balance.clear()
+    get_dividend_totals.clear()
+
+
+def _cash_frame(data):
+    cash_df = pd.DataFrame(data, columns=CASH_COLUMNS)
+    cash_df["date"] = pd.to_datetime(cash_df["date"])
+    cash_df[["amount", "cumulative_total"]] = cash_df[["amount", "cumulative_total"]].astype(float)
+    return cash_df
+
+
+def _div_frame(data):
+    div_df = pd.DataFrame(data, columns=DIV_COLUMNS)
+    div_df[["gross", "tax", "net"]] = div_df[["gross", "tax", "net"]].astype(float)
+    return div_df
+
+
+@st.cache_data(ttl=300)
+def get_cash_balance():
+    try:
+        sync_aggregates()
+        data = supabase.table("cash_balance").select("*").order("date").execute().data
+    except Exception as e:
+        print(f"⚠️ cash_balance unavailable, aggregating transactions_div instead: {e}")
+        data = build_cash_balance(get_deposits_divs()).to_dict("records")
+    return _cash_frame(data)
+
+
+@st.cache_data(ttl=300)
+def get_dividend_totals():
+    try:
+        sync_aggregates()
+        data = supabase.table("dividend_totals").select("*").execute().data
+    except Exception as e:
+        print(f"⚠️ dividend_totals unavailable, aggregating transactions_div instead: {e}")
+        data = build_dividend_totals(get_deposits_divs()).to_dict("records")
+    return _div_frame(data)
@@ -1,9 +1,34 @@
-import yfinance as yf
 import requests
 import pandas as pd
 from supabase_client import supabase
 import streamlit as st
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from data.scheduler import ProviderScheduler, ProviderThrottledError
+
+
+@st.cache_resource
+def get_scheduler():
+    # One scheduler per process, so all sessions share the single-flight table and rate limit
+    return ProviderScheduler()
+
+
+def map_parallel(fn, items, max_workers=8):
+    """Return {item: fn(item)}, running the (I/O bound) calls on a thread pool."""
+    items = list(items)
+    if not items:
+        return {}
+    ctx = get_script_run_ctx()
+
+    def run(item):
+        # Let st.cache_data & co. see the session that spawned us
+        add_script_run_ctx(ctx=ctx)
+        return fn(item)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return dict(zip(items, pool.map(run, items)))
+
 
 def get_transactions():
     response = supabase.table("transactions").select("*").execute()
@@ -18,16 +43,18 @@ def get_deposits_divs():
 
 @st.cache_data(ttl=3600)
 def get_price_and_currency(ticker):
+    scheduler = get_scheduler()
     try:
-        yf_ticker = yf.Ticker(ticker)
-        info = yf_ticker.info
+        info = scheduler.info(ticker)
         currency = info.get("currency", "EUR")
         quote_type = info.get("quoteType", "Equity")  # Default to Equity
-        hist = yf_ticker.history(period="1d")
+        hist = scheduler.history(ticker, period="1d")
         if hist.empty:
             return None, None, None
         price = round(hist["Close"].iloc[-1], 2)
         return price, currency, quote_type
+    except ProviderThrottledError:
+        raise
     except Exception as e:
         print(f"⚠️ get_price_and_currency error for {ticker}: {e}")
         return None, None, None
@@ -51,8 +78,10 @@ def get_fx_to_eur(from_currency):
 @st.cache_data(ttl=86400)
 def get_price_history(ticker, start_date):
     try:
-        data = yf.Ticker(ticker).history(start=start_date)
+        data = get_scheduler().history(ticker, start=start_date)
         return data["Close"]
+    except ProviderThrottledError:
+        raise
     except:
         return pd.Series()
 
@@ -65,40 +94,28 @@ def get_benchmark(name):
         "S&P 500": "^GSPC"
     }
     try:
-        return yf.Ticker(tickers[name]).history(period="1y")["Close"]
+        return get_scheduler().history(tickers[name], period="1y")["Close"]
+    except ProviderThrottledError:
+        raise
     except:
         return pd.Series()
 
 
-def fetch_index_value(symbol: str, day: pd.Timestamp) -> float | None:
-    """Return the last available close <= day as a float, else None."""
-    start = pd.to_datetime(day) - pd.Timedelta(days=7)  # small window to tolerate holidays
-    end   = pd.to_datetime(day) + pd.Timedelta(days=1)  # yfinance end is exclusive
-    try:
-        hist = yf.Ticker(symbol).history(start=start, end=end, auto_adjust=False)
-        if hist.empty or "Close" not in hist:
-            return None
-        # take last close at or before 'day'
-        s = hist["Close"].loc[:pd.to_datetime(day)]
-        if s.empty:
-            return None
-        return float(s.iloc[-1])
-    except Exception:
-        return None
-
-
 @st.cache_data(ttl=3600)
 def get_yesterday_price(ticker):
+    """
+    Return (price_check, price_yesterday). Cached per ticker, so changing a filter
+    never refetches; concurrent cache misses are sent as one batched download.
+    """
     try:
         # Get last 7 calendar days of daily data
-        data = yf.download(ticker, period="7d", interval="1d", progress=False)
-        closes = data["Close"].dropna()
+        closes = get_scheduler().closes([ticker], period="7d", interval="1d")[ticker]
 
         if len(closes) >= 2:
             # Most recent and second most recent closes
-            price_check = closes.iloc[-1].item()
-            price_yesterday = closes.iloc[-2].item()
-            return price_check, price_yesterday
+            return float(closes.iloc[-1]), float(closes.iloc[-2])
+    except ProviderThrottledError:
+        raise
     except Exception as e:
         print(f"⚠️ Failed to fetch price history for {ticker}: {e}")
     return None, None
@@ -1,13 +1,24 @@
 import pandas as pd
-import yfinance as yf
-from data.fetch import fetch_index_value
+from data.fetch import get_scheduler, map_parallel
+from data.portfolio import with_accounts, ACCOUNT_COLUMN
+from data.scheduler import ProviderThrottledError
 from datetime import datetime, timedelta
 from supabase_client import supabase
 from data.fetch import get_transactions, get_deposits_divs  # assume these exist
 import streamlit as st
 
-@st.cache_data(ttl=300)
 def get_historic(df, df_div):
+    try:
+        return _update_historic(df, df_div)
+    except ProviderThrottledError as e:
+        # Not cached, so the backfill is retried once the provider recovers
+        st.warning(f"⚠️ Market data provider is throttling requests, historic data may be stale: {e}")
+        response = supabase.table("historic_data").select("*").execute()
+        return pd.DataFrame(response.data)
+
+
+@st.cache_data(ttl=300)
+def _update_historic(df, df_div):
     response = supabase.table("historic_data").select("*").execute()
     historic = pd.DataFrame(response.data)
 
@@ -19,21 +30,31 @@ def get_historic(df, df_div):
     end_date = pd.Timestamp("today").normalize() - timedelta(days=1)
     missing_days = pd.date_range(start=start_date, end=end_date, freq="B")  # B = business days
 
-    new_records = []
-
     # 1) Get last known AEX/SP from the table to seed forward-fill
     seed = supabase.table("historic_data").select("aex, sp").order("date", desc=True).limit(1).execute().data
     last_aex = seed[0]["aex"] if seed and seed[0].get("aex") is not None else None
     last_sp = seed[0]["sp"] if seed and seed[0].get("sp") is not None else None
 
-    records = []
+    # Per-account history has its own cursor, so it also catches up on days stored before it existed
+    account_days = _missing_account_days(df, end_date)
+
+    new_records = []
+    if len(missing_days) or len(account_days):
+        # One ranged request per ticker and FX pair covers every missing day
+        values, priced = calculate_account_values(df, missing_days.union(account_days))
+        missing_days = _priced_days(missing_days, priced)
+        account_days = _priced_days(account_days, priced)
+    if len(missing_days):
+        aex = _closes_on("^AEX", missing_days, auto_adjust=False)
+        sp = _closes_on("^GSPC", missing_days, auto_adjust=False)
+
     for day in missing_days:
-        value = calculate_portfolio_value_on_date(df, day)
+        value = values.loc[day].sum()
         deposits = calculate_net_deposit_up_to(df_div, day)
         wv = round(value - deposits, 2)
 
-        aex_val = fetch_index_value("^AEX", day)
-        sp_val = fetch_index_value("^GSPC", day)
+        aex_val = None if pd.isna(aex[day]) else float(aex[day])
+        sp_val = None if pd.isna(sp[day]) else float(sp[day])
 
         # Forward-fill within the loop
         if aex_val is None:
@@ -46,7 +67,7 @@ def get_historic(df, df_div):
         else:
             last_sp = sp_val
 
-        records.append({
+        new_records.append({
             "date": day.strftime("%Y-%m-%d"),
             "value": round(value, 2),
             "wv": wv,
@@ -54,6 +75,19 @@ def get_historic(df, df_div):
             "sp": sp_val
         })
 
+    account_records = [
+        {"date": day.strftime("%Y-%m-%d"), "account": account, "value": account_value}
+        for day in account_days
+        for account, account_value in values.loc[day].dropna().items()  # accounts holding nothing yet are left out
+    ]
+
+    if account_records:
+        try:
+            supabase.table("historic_accounts").upsert(account_records, on_conflict="date,account").execute()
+            get_historic_accounts.clear()
+        except Exception as e:
+            print(f"⚠️ Could not store per-account history: {e}")
+
     if new_records:
         supabase.table("historic_data").upsert(new_records).execute()
         print("✅ Historic data updated.")
@@ -64,61 +98,106 @@ def get_historic(df, df_div):
     return pd.DataFrame(response.data)
 
 
-def get_fx_rate_to_eur(currency, date):
-    if currency == "EUR":
-        return 1.0
-    try:
-        fx_pair = f"{currency}EUR=X"
-        hist = yf.Ticker(fx_pair).history(start=date, end=date + pd.Timedelta(days=1))
-        if not hist.empty:
-            return hist["Close"].iloc[0]
-    except Exception as e:
-        print(f"⚠️ FX error for {currency} on {date}: {e}")
-    return None
-
-
-def calculate_portfolio_value_on_date(transactions_df, date):
-    transactions_df["date"] = pd.to_datetime(transactions_df["date"]).dt.tz_localize(None)
-    date = pd.to_datetime(date).tz_localize(None)
-
-    filtered = transactions_df[transactions_df["date"] <= date]
+def _priced_days(days, priced):
+    """
+    Days up to the first one where a held ticker has no price or FX rate. Stored days
+    are never recomputed (the cursor is the last stored date), so that day and all
+    later ones wait for the next run instead of being stored undervalued.
+    """
+    unpriced = days[~priced.reindex(days, fill_value=True).to_numpy()]
+    if len(unpriced) == 0:
+        return days
+    print(f"⚠️ Missing prices on {unpriced[0]:%Y-%m-%d}, not storing history from that day on.")
+    return days[days < unpriced[0]]
 
-    # Determine net holdings per ticker
-    holdings = (
-        filtered.groupby(["ticker", "type"])["amount"]
-        .sum()
-        .unstack(fill_value=0)
-        .fillna(0)
-    )
-    holdings["net"] = holdings.get("buy", 0) - holdings.get("sell", 0)
-    net_holdings = holdings["net"]
 
-    total_value_eur = 0.0
+def _missing_account_days(transactions_df, end_date):
+    """Business days after the last date in historic_accounts, or since the first transaction."""
+    try:
+        last = supabase.table("historic_accounts").select("date").order("date", desc=True).limit(1).execute().data
+    except Exception as e:
+        # Table not migrated yet: keep backfilling historic_data without it
+        print(f"⚠️ historic_accounts unavailable: {e}")
+        return pd.DatetimeIndex([])
+    if last:
+        start_date = pd.to_datetime(last[0]["date"]) + timedelta(days=1)
+    elif not transactions_df.empty:
+        start_date = pd.to_datetime(transactions_df["date"]).dt.tz_localize(None).min().normalize()
+    else:
+        return pd.DatetimeIndex([])
+    return pd.date_range(start=start_date, end=end_date, freq="B")
 
-    for ticker, amount in net_holdings.items():
-        if amount == 0:
-            continue
 
-        # ⚠️ Get most recent currency used for this ticker before or on the date
-        currency_series = filtered[filtered["ticker"] == ticker].sort_values("date")["currency"]
-        currency = currency_series.iloc[-1] if not currency_series.empty else "EUR"
+@st.cache_data(ttl=300)
+def get_historic_accounts():
+    """Per-account values written by get_historic, one row per date and account."""
+    try:
+        response = supabase.table("historic_accounts").select("*").execute()
+    except Exception as e:
+        # Table not migrated yet: no per-account lines, the rest of the app still works
+        print(f"⚠️ historic_accounts unavailable: {e}")
+        return pd.DataFrame(columns=["date", "account", "value"])
+    return pd.DataFrame(response.data, columns=["date", "account", "value"])
 
-        try:
-            hist = yf.Ticker(ticker).history(start=date, end=date + pd.Timedelta(days=1))
-            if hist.empty:
-                continue
-            price = hist["Close"].iloc[0]
-            fx_rate = get_fx_rate_to_eur(currency, date)
-            if fx_rate is None:
-                print(f"❌ No FX rate for {currency}, skipping {ticker}")
-                continue
-            # print(str(ticker) + ' amount ' + str(amount) + ' and value = ' + str(price * amount * fx_rate))
-            total_value_eur += price * amount * fx_rate
-        except Exception as e:
-            print(f"⚠️ Error with {ticker}: {e}")
-            continue
 
-    return round(total_value_eur, 2)
+def _closes_on(symbol, days, **kwargs):
+    """Last close on or before each of `days`, from one ranged request for the whole span."""
+    # Start a week early so a holiday on the first day still has a previous close
+    start = days[0] - pd.Timedelta(days=7)
+    end = days[-1] + pd.Timedelta(days=1)  # yfinance end is exclusive
+    try:
+        hist = get_scheduler().history(symbol, start=start, end=end, **kwargs)
+        if hist.empty or "Close" not in hist:
+            return pd.Series(index=days, dtype=float)
+        closes = hist["Close"].dropna()
+        closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+        # A close at most a week old tolerates holidays without masking a missing series
+        return closes.sort_index().reindex(days, method="ffill", tolerance=pd.Timedelta(days=7))
+    except ProviderThrottledError:
+        raise
+    except Exception as e:
+        print(f"⚠️ Error with {symbol}: {e}")
+        return pd.Series(index=days, dtype=float)
+
+
+def calculate_account_values(transactions_df, days):
+    """
+    Return (values, priced): the EUR value per day (rows) and account (columns), NaN
+    where an account holds nothing, and per day whether every held ticker had a price
+    and FX rate. Prices come from one ranged request per ticker and FX pair, shared by
+    all accounts and days.
+    """
+    if transactions_df.empty:
+        return pd.DataFrame(index=days), pd.Series(True, index=days)
+    transactions_df = with_accounts(transactions_df)
+    transactions_df["date"] = pd.to_datetime(transactions_df["date"]).dt.tz_localize(None)
+    transactions_df = transactions_df.sort_values("date")
+
+    # Net holdings per account and ticker at the end of each day
+    sign = transactions_df["type"].map({"buy": 1, "sell": -1}).fillna(0)
+    changes = (transactions_df["amount"] * sign).groupby(
+        [transactions_df["date"], transactions_df[ACCOUNT_COLUMN], transactions_df["ticker"]]
+    ).sum().unstack([ACCOUNT_COLUMN, "ticker"], fill_value=0)
+    holdings = changes.cumsum().reindex(days, method="ffill").fillna(0)
+    holdings = holdings.loc[:, (holdings != 0).any()]
+    if holdings.empty:
+        return pd.DataFrame(index=days), pd.Series(True, index=days)
+
+    # ⚠️ Most recent currency used for each ticker
+    tickers = holdings.columns.get_level_values("ticker").unique()
+    currencies = transactions_df.groupby("ticker")["currency"].last().reindex(tickers).fillna("EUR")
+    fx_pairs = {c: f"{c}EUR=X" for c in currencies.unique() if c != "EUR"}
+
+    closes = map_parallel(lambda symbol: _closes_on(symbol, days), list(tickers) + list(fx_pairs.values()))
+    prices = pd.DataFrame({
+        t: closes[t] * (closes[fx_pairs[c]] if c in fx_pairs else 1.0) for t, c in currencies.items()
+    }, index=days)
+
+    unit_prices = prices[holdings.columns.get_level_values("ticker")].set_axis(holdings.columns, axis=1)
+    priced = ~((holdings != 0) & unit_prices.isna()).any(axis=1)
+    values = (holdings * unit_prices.fillna(0)).T.groupby(level=ACCOUNT_COLUMN).sum().T
+    held = (holdings != 0).T.groupby(level=ACCOUNT_COLUMN).any().T
+    return values.where(held).round(2), priced
 
 
 def calculate_net_deposit_up_to(cashflows_df,date):
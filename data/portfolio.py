@@ -1,51 +1,100 @@
+import numpy as np
 import pandas as pd
-from data.fetch import get_price_and_currency, get_fx_to_eur, get_yesterday_price
+from data.fetch import get_price_and_currency, get_fx_to_eur, get_yesterday_price, map_parallel
+from data.scheduler import ProviderThrottledError
 
+ACCOUNT_COLUMN = "account"
+DEFAULT_ACCOUNT = "Default"
 
-def calculate_portfolio(df):
-    if df.empty:
-        return pd.DataFrame(), 0.0
-
-    holdings = {}
-    for _, row in df.iterrows():
-        multiplier = 1 if row["type"].lower() == "buy" else -1
-        holdings[row["ticker"]] = holdings.get(row["ticker"], 0) + multiplier * row["amount"]
 
-    result = []
-    total_eur = 0.0
+def with_accounts(df):
+    """Return df with an account column, putting rows without one in the default account."""
+    df = df.copy()
+    if ACCOUNT_COLUMN not in df.columns:
+        df[ACCOUNT_COLUMN] = DEFAULT_ACCOUNT
+    else:
+        df[ACCOUNT_COLUMN] = df[ACCOUNT_COLUMN].fillna(DEFAULT_ACCOUNT)
+    return df
 
-    for ticker, quantity in holdings.items():
-        if quantity == 0:
-            continue
 
+def _get_quote(ticker):
+    status = "ok"
+    try:
         price_today, currency, quote_type = get_price_and_currency(ticker)
+    except ProviderThrottledError:
+        price_today, currency, quote_type = None, None, None
+        status = "throttled"
+    fx = get_fx_to_eur(currency) if currency else 1.0
+    return {"Price": price_today, "Currency": currency, "FX to EUR": fx, "type": quote_type, "Status": status}
+
+
+def _get_change(ticker):
+    """Return (% change vs yesterday, status); a throttled lookup only loses the change, not the price."""
+    try:
         price_check, price_yesterday = get_yesterday_price(ticker)
+    except ProviderThrottledError:
+        return None, "throttled"
+    if price_check is not None and price_yesterday not in [None, 0] and price_check != price_yesterday:
+        return round(((price_check - price_yesterday) / price_yesterday) * 100, 2), "ok"
+    return None, "ok"
+
 
-        fx = get_fx_to_eur(currency) if currency else 1.0
-        value_native = round(price_today * quantity, 2) if price_today else 0
-        value_eur = round(value_native * fx, 2) if fx else 0
-        total_eur += value_eur
-
-        # Calculate % change vs yesterday
-        pct_change = None
-        if price_check is not None and price_yesterday not in [None, 0] and price_check != price_yesterday:
-            pct_change = round(((price_check - price_yesterday) / price_yesterday) * 100, 2)
-
-        print(f"Ticker: {ticker}, Quantity: {quantity}, Price: {price_today}, Currency: {currency}, Type: {quote_type}")
-
-        result.append({
-            "Ticker": ticker,
-            "Quantity": quantity,
-            "Price": price_today,
-            "Currency": currency,
-            "FX to EUR": fx,
-            "Value (€)": value_eur,
-            "% Change (1d)": pct_change,
-            "type": quote_type
-        })
-
-    df_result = pd.DataFrame(result).sort_values(by="Value (€)", ascending=False)
-    return df_result, round(total_eur, 0)
+def _value_eur(quantity, quotes):
+    price = pd.to_numeric(quotes["Price"], errors="coerce").fillna(0)
+    fx = pd.to_numeric(quotes["FX to EUR"], errors="coerce").fillna(0)
+    return ((price * quantity).round(2) * fx).round(2)
+
+
+def calculate_portfolio(df):
+    """
+    Value all accounts in df at once.
+
+    Returns (portfolio_df, total_value, accounts_df): the consolidated positions
+    per ticker, their total in EUR, and the positions per account and ticker.
+    """
+    if df.empty:
+        return pd.DataFrame(), 0.0, pd.DataFrame()
+
+    df = with_accounts(df)
+    multiplier = np.where(df["type"].str.lower() == "buy", 1, -1)
+    holdings = (df["amount"] * multiplier).groupby([df[ACCOUNT_COLUMN], df["ticker"]]).sum()
+    holdings = holdings[holdings != 0]
+    totals = holdings.groupby(level="ticker").sum()
+    totals = totals[totals != 0]
+    if holdings.empty:
+        return pd.DataFrame(), 0.0, pd.DataFrame()
+
+    # Market data is fetched once for the union of tickers over all accounts
+    open_tickers = tuple(sorted(holdings.index.get_level_values("ticker").unique()))
+    quotes = pd.DataFrame.from_dict(map_parallel(_get_quote, open_tickers), orient="index")
+
+    # One worker per ticker, so all cache misses join the same batched download
+    changes = map_parallel(_get_change, open_tickers, max_workers=len(open_tickers))
+    quotes["% Change (1d)"] = pd.Series({t: change for t, (change, _) in changes.items()}, dtype=float)
+    quotes["Change Status"] = pd.Series({t: status for t, (_, status) in changes.items()})
+
+    # Consolidated, valued from the total quantity per ticker
+    result = quotes.loc[totals.index].copy()
+    result.insert(0, "Ticker", totals.index)
+    result.insert(1, "Quantity", totals.values)
+    result["Value (€)"] = _value_eur(result["Quantity"], result)
+    result = result[["Ticker", "Quantity", "Price", "Currency", "FX to EUR", "Value (€)",
+                     "% Change (1d)", "type", "Status", "Change Status"]].reset_index(drop=True)
+
+    for row in result.itertuples():
+        print(f"Ticker: {row.Ticker}, Quantity: {row.Quantity}, Price: {row.Price}, Currency: {row.Currency}, Type: {row.type}")
+
+    # Per account, all accounts in one vectorized pass over the shared quotes
+    accounts = holdings.rename("Quantity").reset_index()
+    accounts.columns = ["Account", "Ticker", "Quantity"]
+    account_quotes = quotes.loc[accounts["Ticker"]].reset_index(drop=True)
+    accounts["Value (€)"] = _value_eur(accounts["Quantity"], account_quotes)
+    accounts["% Change (1d)"] = account_quotes["% Change (1d)"]
+    accounts["type"] = account_quotes["type"]
+
+    df_result = result.sort_values(by="Value (€)", ascending=False)
+    total_eur = df_result["Value (€)"].sum()
+    return df_result, round(total_eur, 0), accounts.sort_values(["Account", "Value (€)"], ascending=[True, False])
 
 
 def calculate_cash(df):
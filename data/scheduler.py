@@ -0,0 +1,201 @@
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+
+
+class ProviderThrottledError(Exception):
+    """Raised when Yahoo throttles us, or when our own rate limit is exhausted."""
+
+
+def _is_throttle(exc):
+    # By type only: yfinance messages embed the symbol, so text matching misfires (e.g. "0429.HK")
+    return isinstance(exc, (YFRateLimitError, ProviderThrottledError))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout):
+        """Take one token, waiting at most `timeout` seconds. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self):
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class _Batch:
+    def __init__(self):
+        self.symbols = set()
+        self.done = threading.Event()
+        self.closes = None
+        self.error = None
+
+
+class ProviderScheduler:
+    """
+    Shared front door for all yfinance traffic of the process.
+
+    - identical in-flight requests (across sessions) are executed once
+    - every outgoing request takes a token from a rate limiter
+    - daily close requests are queued for `batch_window` seconds and sent
+      as one multi-ticker `yf.download`
+    - throttling raises ProviderThrottledError instead of returning empty data,
+      and puts the scheduler in a cooldown so we stop hammering Yahoo
+    """
+
+    def __init__(self, rate=2.0, burst=10, max_wait=10.0, batch_window=0.2, cooldown=60.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_wait = max_wait
+        self.batch_window = batch_window
+        self.cooldown = cooldown
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._blocked_until = 0.0
+
+    # --- rate limiting ---
+    def _acquire(self):
+        remaining = self._blocked_until - time.monotonic()
+        if remaining > 0:
+            raise ProviderThrottledError(f"provider cooling down, retry in {remaining:.0f}s")
+        if not self.bucket.acquire(self.max_wait):
+            raise ProviderThrottledError("local request budget exhausted")
+
+    def _throttled(self, exc):
+        self._blocked_until = time.monotonic() + self.cooldown
+        self.bucket.drain()
+        return ProviderThrottledError(str(exc) or "rate limited by Yahoo Finance")
+
+    def _call(self, fn):
+        self._acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if _is_throttle(e):
+                raise self._throttled(e) from e
+            raise
+
+    # --- single requests ---
+    def info(self, ticker):
+        return self._flight.do(("info", ticker), lambda: self._call(lambda: yf.Ticker(ticker).info))
+
+    def history(self, ticker, **kwargs):
+        key = ("history", ticker, tuple(sorted(kwargs.items())))
+        return self._flight.do(key, lambda: self._call(lambda: yf.Ticker(ticker).history(**kwargs)))
+
+    # --- batched daily closes ---
+    def closes(self, tickers, period="7d", interval="1d"):
+        """
+        Return {ticker: Close series} for `tickers`. Requests queued by other
+        sessions within `batch_window` are sent along in the same download.
+        """
+        if not tickers:
+            return {}
+        key = (period, interval)
+        with self._lock:
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _Batch()
+            batch.symbols.update(t.upper() for t in tickers)  # yf.download upper-cases its columns
+
+        if leader:
+            time.sleep(self.batch_window)
+            with self._lock:
+                del self._pending[key]
+            try:
+                batch.closes = self._call(lambda: self._download(sorted(batch.symbols), period, interval))
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        result = {}
+        for ticker in tickers:
+            symbol = ticker.upper()
+            if batch.closes is None or symbol not in batch.closes:
+                result[ticker] = pd.Series(dtype=float)
+            else:
+                result[ticker] = batch.closes[symbol].dropna()
+        return result
+
+    def _download(self, symbols, period, interval):
+        data = yf.download(symbols, period=period, interval=interval, progress=False)
+        # yf.download swallows per-ticker errors into yf.shared._ERRORS as repr(e)
+        errors = getattr(yf.shared, "_ERRORS", {}) or {}
+        for symbol in symbols:
+            err = errors.get(symbol.upper())
+            if isinstance(err, str) and err.startswith("YFRateLimitError("):
+                raise ProviderThrottledError(f"{symbol}: {err}")
+        if data is None or data.empty:
+            return pd.DataFrame()
+        return data["Close"]
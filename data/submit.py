@@ -1,19 +1,24 @@
 from supabase import create_client
 import streamlit as st
 import datetime
+from data.aggregates import apply_cashflow, cashflow_lock, mark_aggregates_stale
+from data.portfolio import DEFAULT_ACCOUNT
 
 url = st.secrets["url"]
 key = st.secrets["key"]
 supabase = create_client(url, key)
 
 
-def submit_transaction_form():
+def submit_transaction_form(accounts=()):
     with st.expander("➕ Add New Transaction"):
         with st.form("add_transaction"):
-            ticker = st.text_input("Ticker (e.g. ASML.AS)")
+            # Widgets in a form don't rerun on change, so offer both and let a typed name win
+            account = st.selectbox("Account", list(accounts) or [DEFAULT_ACCOUNT], key="tx_account")
+            new_account = st.text_input("Or new account", key="tx_new_account")
+            ticker = st.text_input("Ticker (e.g. ASML.AS)", key="tx_ticker")
             date = st.date_input("Date", value=datetime.date.today())
-            amount = st.number_input("Amount", step=1.0)
-            price = st.number_input("Price", step=0.01)
+            amount = st.number_input("Amount", step=1.0, key="tx_amount")
+            price = st.number_input("Price", step=0.01, key="tx_price")
             tx_type = st.selectbox("Type", ["buy", "sell"])
             currency = st.selectbox("Currency", ["EUR", "USD", "HKD"])
             fx_rate = st.number_input("FX Rate", value=1.0)
@@ -24,6 +29,7 @@ def submit_transaction_form():
         if submit:
             record = {
                 "date": str(date),
+                "account": new_account.strip() or account,
                 "ticker": ticker,
                 "amount": amount,
                 "price": price,
@@ -44,11 +50,11 @@ def submit_transaction_form():
 def submit_deposits_divs_form():
     with st.expander("➕ Add New Deposit/Dividend"):
         with st.form("add_deposit_div"):
-            ticker = st.text_input("Ticker (e.g. ASML.AS)")
+            ticker = st.text_input("Ticker (e.g. ASML.AS)", key="div_ticker")
             date = st.date_input("Date", value=datetime.date.today())
-            amount = st.number_input("Amount", step=1.0)
+            amount = st.number_input("Amount", step=1.0, key="div_amount")
             currency = st.selectbox("Currency", ["EUR", "USD", "HKD"])
-            type_text = st.selectbox("Type", ["Deposit", "Dividend Gross", "Dividend Tax", "Withdrawal"])
+            type_text = st.selectbox("Type", ["Deposit", "Dividend Gross", "Dividend Tax", "Withdrawal"], key="div_type")
             submit = st.form_submit_button("Submit")
 
         if submit:
@@ -59,9 +65,23 @@ def submit_deposits_divs_form():
                 "type": type_text,
                 "currency": currency,
             }
-            try:
-                supabase.table("transactions_div").insert(record).execute()
-                st.success("✅ Deposit/Div added.")
-                st.rerun()
-            except Exception as e:
-                st.error(f"❌ Failed to add deposit/div: {e}")
+            # Held across insert and update so a concurrent rebuild can't count the row twice
+            with cashflow_lock():
+                try:
+                    supabase.table("transactions_div").insert(record).execute()
+                except Exception as e:
+                    st.error(f"❌ Failed to add deposit/div: {e}")
+                    return
+
+                try:
+                    apply_cashflow(record)
+                except Exception as e:
+                    # The row is saved; only the aggregates are behind. Don't rerun, so the
+                    # warning stays visible while this run rebuilds them.
+                    mark_aggregates_stale()
+                    st.warning(f"⚠️ Deposit/Div added, but updating the cashflow aggregates failed: {e}. "
+                               "They will be rebuilt.")
+                    return
+
+            st.success("✅ Deposit/Div added.")
+            st.rerun()
@@ -0,0 +1,240 @@
+import random
+import sys
+import threading
+import time
+import types
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+# --- Supabase ---
+# Conflict columns for upserts without an explicit on_conflict
+PRIMARY_KEYS = {"historic_data": "date", "cash_balance": "date", "historic_accounts": "date,account"}
+
+
+class _Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class _Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self._columns = None
+        self._filters = []
+        self._write = None
+        self._delete = False
+        self._count = None
+        self._conflict = None
+        self._order = None
+        self._limit = None
+
+    def select(self, columns="*", count=None):
+        self._count = count
+        self._columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def lt(self, column, value):
+        self._filters.append(lambda r: r.get(column) < value)
+        return self
+
+    def gte(self, column, value):
+        self._filters.append(lambda r: r.get(column) >= value)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def insert(self, records):
+        self._write = records if isinstance(records, list) else [records]
+        return self
+
+    def delete(self):
+        self._delete = True
+        return self
+
+    def upsert(self, records, on_conflict=None):
+        self._conflict = (on_conflict or PRIMARY_KEYS.get(self.table, "id")).split(",")
+        return self.insert(records)
+
+    def execute(self):
+        time.sleep(self.db.latency)
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            if self._write is not None:
+                for record in self._write:
+                    match = None
+                    if self._conflict:
+                        key = [record.get(c) for c in self._conflict]
+                        match = next((r for r in rows if [r.get(c) for c in self._conflict] == key), None)
+                    if match is not None:
+                        match.update(record)
+                    else:
+                        rows.append(dict(record))
+                return _Response(self._write)
+            if self._delete:
+                kept = [r for r in rows if not all(f(r) for f in self._filters)]
+                deleted = [r for r in rows if all(f(r) for f in self._filters)]
+                rows[:] = kept
+                return _Response(deleted)
+            out = [dict(r) for r in rows if all(f(r) for f in self._filters)]
+        total = len(out) if self._count else None
+        if self._order:
+            column, desc = self._order
+            out.sort(key=lambda r: r.get(column), reverse=desc)
+        if self._limit is not None:
+            out = out[:self._limit]
+        if self._columns:
+            out = [{c: r.get(c) for c in self._columns} for r in out]
+        return _Response(out, count=total)
+
+
+class FakeSupabase:
+    """In-memory stand-in for the supabase client, shared by all sessions."""
+
+    def __init__(self, tables, latency=0.0):
+        self.tables = tables
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+def seed_tables(tickers, years=3, seed=0, accounts=("Personal", "Family"), missing_days=0):
+    rng = random.Random(seed)
+    today = pd.Timestamp("today").normalize()
+    start = today - pd.DateOffset(years=years)
+
+    transactions = []
+    for ticker in tickers:
+        for day in pd.date_range(start, today, periods=8):
+            transactions.append({
+                "date": day.strftime("%Y-%m-%d"),
+                "ticker": ticker,
+                "account": rng.choice(accounts),
+                "amount": float(rng.randint(1, 20)),
+                "price": round(rng.uniform(20, 400), 2),
+                "type": "buy",
+                "currency": "USD" if "." not in ticker else "EUR",
+                "fx_rate": 1.0,
+                "transaction_fee": 1.0,
+                "total_value": 0.0,
+            })
+
+    cashflows = []
+    for day in pd.date_range(start, today, freq="MS"):
+        cashflows.append({"date": day.strftime("%Y-%m-%d"), "ticker": "", "amount": 500.0,
+                          "type": "Deposit", "currency": "EUR"})
+        ticker = rng.choice(tickers)
+        gross = round(rng.uniform(5, 50), 2)
+        cashflows.append({"date": day.strftime("%Y-%m-%d"), "ticker": ticker, "amount": gross,
+                          "type": "Dividend Gross", "currency": "EUR"})
+        cashflows.append({"date": day.strftime("%Y-%m-%d"), "ticker": ticker, "amount": -round(gross * 0.15, 2),
+                          "type": "Dividend Tax", "currency": "EUR"})
+
+    # Historic data up to yesterday, minus `missing_days` business days left for get_historic to backfill
+    historic = []
+    for i, day in enumerate(pd.date_range(start, history_cutoff(missing_days), freq="B", inclusive="left")):
+        historic.append({"date": day.strftime("%Y-%m-%d"), "value": 10000 + i * 5.0, "wv": i * 2.0,
+                         "aex": 800 + i * 0.2, "sp": 4000 + i * 1.0})
+
+    # Aggregate tables start empty so the first session bootstraps them
+    return {"transactions": transactions, "transactions_div": cashflows, "historic_data": historic,
+            "cash_balance": [], "dividend_totals": [], "historic_accounts": []}
+
+
+def history_cutoff(missing_days):
+    """First date get_historic has to backfill when `missing_days` business days are missing."""
+    return pd.Timestamp("today").normalize() - pd.offsets.BDay(missing_days)
+
+
+def drop_recent_history(db, missing_days):
+    """Remove stored history from the cutoff on, so the next round backfills it again."""
+    cutoff = history_cutoff(missing_days).strftime("%Y-%m-%d")
+    with db.lock:
+        for table in ("historic_data", "historic_accounts"):
+            db.tables[table] = [r for r in db.tables.get(table, []) if r["date"] < cutoff]
+
+
+# --- Market data ---
+def _closes(ticker, index):
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    base = 0.9 if ticker.endswith("=X") else 100  # FX pairs trade around 1
+    walk = base * np.exp(np.cumsum(rng.normal(0, 0.01, len(index))))
+    return pd.Series(walk.round(4), index=index)
+
+
+def _index(period=None, start=None, end=None, **kwargs):
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp("today").normalize() + pd.Timedelta(days=1)
+    if start is not None:
+        start = pd.Timestamp(start)
+    else:
+        days = {"1d": 1, "5d": 5, "7d": 7, "1mo": 31, "1y": 365}.get(period, 365)
+        start = end - pd.Timedelta(days=days)
+    return pd.bdate_range(start, end - pd.Timedelta(days=1))
+
+
+class FakeTicker:
+    latency = 0.0
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    @property
+    def info(self):
+        time.sleep(self.latency)
+        currency = "EUR" if "." in self.ticker else "USD"
+        return {"currency": currency, "quoteType": "ETF" if self.ticker.startswith("V") else "EQUITY"}
+
+    def history(self, period=None, start=None, end=None, **kwargs):
+        time.sleep(self.latency)
+        index = _index(period, start, end)
+        return pd.DataFrame({"Close": _closes(self.ticker, index)})
+
+
+def fake_download(tickers, period=None, interval="1d", start=None, end=None, progress=False, **kwargs):
+    time.sleep(FakeTicker.latency)
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    index = _index(period, start, end)
+    frames = {("Close", t.upper()): _closes(t.upper(), index) for t in tickers}
+    return pd.DataFrame(frames, index=index).rename_axis(columns=["Price", "Ticker"])
+
+
+class _FxResponse:
+    def json(self):
+        return {"result": "success", "rates": {"EUR": 0.9}}
+
+
+def install(tables, db_latency=0.0, market_latency=0.0):
+    """
+    Swap supabase, yfinance and the FX endpoint for local fakes. Must run
+    before the app modules are imported, since they create their clients
+    at import time.
+    """
+    db = FakeSupabase(tables, latency=db_latency)
+    module = types.ModuleType("supabase")
+    module.create_client = lambda url, key: db
+    sys.modules["supabase"] = module
+
+    import requests
+    import yfinance as yf
+
+    FakeTicker.latency = market_latency
+    yf.Ticker = FakeTicker
+    yf.download = fake_download
+    requests.get = lambda url, *args, **kwargs: _FxResponse()
+    return db
@@ -0,0 +1,229 @@
+"""
+Drive app.py headlessly with N concurrent sessions against local fakes.
+
+    python -m loadtest.harness --sessions 10 --iterations 5
+
+Each session opens the app, then repeatedly changes the ticker filter,
+submits a transaction and adds a deposit or dividend. Reports p50/p95 rerun
+latency per interaction, throughput, and RSS growth per session (after a
+warm-up session has paid for imports and the shared caches).
+
+The warm-up leaves every cache hot and history complete. To measure the
+many-sessions-after-cache-expiry case instead, run several rounds on a cold
+provider with part of the history left to backfill:
+
+    python -m loadtest.harness --rounds 3 --clear-caches --missing-days 5
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+TICKERS = ["AAPL", "MSFT", "ASML.AS", "VWRL.AS", "NVDA", "KO"]
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from loadtest import fakes
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak rather than current RSS, but better than nothing outside Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.timeouts = defaultdict(int)
+
+    def timed(self, name, at, timeout):
+        """Run one rerun and record it. Returns False if it timed out, the session can't go on."""
+        start = time.perf_counter()
+        try:
+            at.run(timeout=timeout)
+            timed_out = False
+        except RuntimeError:
+            # AppTest raises RuntimeError when a script run exceeds `timeout`
+            timed_out = True
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if timed_out:
+                self.timeouts[name] += 1
+            elif at.exception:
+                self.errors[name] += 1
+        return not timed_out
+
+    def failed(self, name):
+        with self.lock:
+            self.errors[name] += 1
+
+
+def share_runtime():
+    """
+    AppTest installs a mock Runtime singleton for the duration of each run and
+    clears it afterwards, which breaks any other session still running. Install
+    one mock shared by all sessions (as in a real server) and fall back to it.
+    """
+    from unittest.mock import MagicMock
+
+    import streamlit as st
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.secrets import Secrets
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # Set secrets once globally rather than per AppTest, which swaps st.secrets on every run
+    st.secrets = Secrets()
+    st.secrets._secrets = {"url": "http://fake-supabase.local", "key": "fake"}
+
+
+def submit_button(at, form):
+    # form_submit_button takes no key, so pick it by the form it belongs to
+    return next(b for b in at.button if b.form_id == form)
+
+
+def run_session(session_id, recorder, iterations, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    if not recorder.timed("open", at, timeout):
+        return at
+
+    for i in range(iterations):
+        # Change ticker filter: drop one ticker, rotating per iteration
+        selected = [t for j, t in enumerate(TICKERS) if j != (session_id + i) % len(TICKERS)]
+        ticker_filter = next(m for m in at.sidebar.multiselect if m.label == "Filter by ticker")
+        ticker_filter.set_value(selected)
+        if not recorder.timed("filter", at, timeout):
+            return at
+
+        # Submit a transaction through the form
+        at.text_input(key="tx_ticker").set_value(TICKERS[i % len(TICKERS)])
+        at.number_input(key="tx_amount").set_value(1.0)
+        at.number_input(key="tx_price").set_value(100.0)
+        submit_button(at, "add_transaction").click()
+        if not recorder.timed("submit", at, timeout):
+            return at
+
+        # Add a deposit or dividend, which updates the cashflow aggregates
+        at.text_input(key="div_ticker").set_value(TICKERS[i % len(TICKERS)])
+        at.number_input(key="div_amount").set_value(50.0)
+        at.selectbox(key="div_type").set_value("Deposit" if i % 2 == 0 else "Dividend Gross")
+        submit_button(at, "add_deposit_div").click()
+        if not recorder.timed("cashflow", at, timeout):
+            return at
+
+    return at  # keep the session alive until RSS has been measured
+
+
+def clear_caches():
+    """Drop all st.cache_data / st.cache_resource entries, as after a TTL expiry or restart."""
+    import streamlit as st
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def report(recorder, wall, sessions, rss_before, rss_after):
+    print(f"\n{'interaction':<12}{'runs':>6}{'errors':>8}{'timeouts':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    total = 0
+    for name, samples in recorder.samples.items():
+        ms = np.array(samples) * 1000
+        total += len(samples)
+        print(f"{name:<12}{len(samples):>6}{recorder.errors[name]:>8}{recorder.timeouts[name]:>10}"
+              f"{np.percentile(ms, 50):>10.1f}{np.percentile(ms, 95):>10.1f}{ms.max():>10.1f}")
+    if recorder.errors["session"]:
+        print(f"sessions aborted by an exception in the harness: {recorder.errors['session']}")
+
+    print(f"\nsessions:     {sessions} per round")
+    print(f"reruns:       {total} in {wall:.2f}s ({total / wall:.2f} reruns/s)")
+    print(f"RSS:          {rss_before:.1f} MB -> {rss_after:.1f} MB "
+          f"({(rss_after - rss_before) / sessions:.2f} MB per live session)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per rerun")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="seconds per Supabase query")
+    parser.add_argument("--market-latency", type=float, default=0.05, help="seconds per market data call")
+    parser.add_argument("--years", type=int, default=3, help="years of seeded history")
+    parser.add_argument("--missing-days", type=int, default=0,
+                        help="business days missing from historic_data at the start of every round")
+    parser.add_argument("--rounds", type=int, default=1, help="batches of concurrent sessions")
+    parser.add_argument("--clear-caches", action="store_true",
+                        help="clear st.cache_* before every round, so sessions start on a cold provider")
+    args = parser.parse_args(argv)
+
+    db = fakes.install(fakes.seed_tables(TICKERS, years=args.years, missing_days=args.missing_days),
+                       db_latency=args.db_latency, market_latency=args.market_latency)
+    share_runtime()
+
+    # Warm-up session so imports and the shared st.cache_* entries don't count as per-session cost
+    warmup = Recorder()
+    run_session(0, warmup, 0, args.timeout)
+    if warmup.timeouts["open"]:
+        print(f"warm-up session timed out after {args.timeout:.0f}s, later sessions may start on cold caches")
+
+    gc.collect()
+    rss_before = rss_mb()
+    recorder = Recorder()
+
+    wall = 0.0
+    apps = []
+    for _ in range(args.rounds):
+        apps.clear()  # sessions of the previous round are closed
+        if args.missing_days:
+            fakes.drop_recent_history(db, args.missing_days)
+        if args.clear_caches:
+            clear_caches()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [pool.submit(run_session, i, recorder, args.iterations, args.timeout)
+                       for i in range(args.sessions)]
+            for f in futures:
+                try:
+                    apps.append(f.result())
+                except Exception as e:
+                    # e.g. a widget missing after a failed rerun; keep the other sessions' results
+                    print(f"⚠️ session failed: {e!r}")
+                    recorder.failed("session")
+        wall += time.perf_counter() - start
+
+        gc.collect()
+        rss_after = rss_mb()
+
+    report(recorder, wall, args.sessions, rss_before, rss_after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+-- Running cashflow aggregates maintained by data/aggregates.py
+
+create table if not exists cash_balance (
+    date             date primary key,
+    amount           numeric not null default 0,
+    cumulative_total numeric not null default 0
+);
+
+create table if not exists dividend_totals (
+    ticker   text    not null,
+    year     integer not null,
+    currency text    not null,
+    gross    numeric not null default 0,
+    tax      numeric not null default 0,
+    net      numeric not null default 0,
+    primary key (ticker, year, currency)
+);
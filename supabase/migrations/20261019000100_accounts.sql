@@ -0,0 +1,10 @@
+-- Multi-account portfolios: transactions carry an account, history is kept per account
+
+alter table transactions add column if not exists account text;
+
+create table if not exists historic_accounts (
+    date    date    not null,
+    account text    not null,
+    value   numeric not null default 0,
+    primary key (date, account)
+);
@@ -0,0 +1,6 @@
+-- Row count of transactions_div the cashflow aggregates were built from, shared by all app instances
+
+create table if not exists aggregate_sync (
+    name        text primary key,
+    source_rows bigint
+);
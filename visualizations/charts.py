@@ -77,6 +77,38 @@ def show_portfolio(portfolio_df, currency_symbol="€", columns_per_row=4):
     return round(weighted_change, 2)
 
 
+def show_account_totals(accounts_df, currency_symbol="€"):
+    if accounts_df.empty or accounts_df["Account"].nunique() < 2:
+        return
+
+    st.subheader("🗂️ Accounts")
+
+    # --- Value and weighted 1d change per account ---
+    totals = []
+    for account, group in accounts_df.groupby("Account"):
+        value = group["Value (€)"].sum()
+        valid = group[group["% Change (1d)"].notna()]
+        valid_value = valid["Value (€)"].sum()
+        change = (valid["Value (€)"] * valid["% Change (1d)"]).sum() / valid_value if valid_value > 0 else 0.0
+        totals.append((account, value, change))
+
+    cols = st.columns(len(totals))
+    for col, (account, value, change) in zip(cols, totals):
+        col.metric(label=account, value=f"{currency_symbol}{value:,.2f}", delta=f"{round(change, 2)}%")
+
+    chart = alt.Chart(accounts_df).mark_bar().encode(
+        x=alt.X("Account:N", title="Account"),
+        y=alt.Y("Value (€):Q", title="Value (€)"),
+        color=alt.Color("Ticker:N", title="Ticker"),
+        tooltip=["Account", "Ticker", "Quantity", "Value (€)"]
+    ).properties(
+        width="container",
+        height=400,
+        title="Value per Account by Ticker"
+    )
+    st.altair_chart(chart, use_container_width=True)
+
+
 def show_allocation_chart(portfolio_df):
     if portfolio_df.empty:
         st.info("No portfolio data available.")
@@ -115,8 +147,8 @@ def show_graph_deposits(cash_df):
 
     # Bar chart for cash movements
     bars = base.mark_bar(color="#4e79a7").encode(
-        y=alt.Y("signed_amount:Q", title="Daily Cash Flow (€)"),
-        tooltip=["date", "type", "amount"]
+        y=alt.Y("amount:Q", title="Daily Cash Flow (€)"),
+        tooltip=["date", "amount"]
     )
 
     # Line chart for cumulative total (right Y-axis)
@@ -137,16 +169,16 @@ def show_graph_deposits(cash_df):
     st.altair_chart(combined_chart, use_container_width=True)
 
 
-def show_graph_div(div_df):
-    # Group per ticker and type
-    div_summary = div_df.groupby(["ticker", "type"])["amount"].sum().reset_index()
+def show_graph_div(div_totals):
+    if div_totals.empty:
+        st.info("No dividends recorded.")
+        return
 
-    # Pivot to get net = gross + tax
-    net_df = div_summary.pivot(index="ticker", columns="type", values="amount").fillna(0)
-    net_df["Dividend Net"] = net_df.get("Dividend Gross", 0) + net_df.get("Dividend Tax", 0)
+    # Totals are pre-aggregated per ticker/year/currency, only fold the years together
+    net_df = div_totals.groupby("ticker")[["net", "tax"]].sum()
+    net_df.columns = ["Dividend Net", "Dividend Tax"]
 
-    # Keep only Net and Tax
-    plot_df = net_df[["Dividend Net", "Dividend Tax"]].reset_index().melt(
+    plot_df = net_df.reset_index().melt(
         id_vars="ticker", var_name="type", value_name="amount"
     )
 
@@ -235,7 +267,8 @@ def _rebase_per_year(values: pd.Series, dates: pd.Series) -> pd.Series:
     out = pd.concat(parts).sort_index()
     return out.reindex(s.index)
 
-def show_graph_development(history: pd.DataFrame, cash_div: pd.DataFrame):
+def show_graph_development(history: pd.DataFrame, cash_div: pd.DataFrame, account_history: pd.DataFrame | None = None,
+                           selected_accounts: list | None = None):
     if history.empty:
         st.info("No historic portfolio data.")
         return
@@ -279,6 +312,18 @@ def show_graph_development(history: pd.DataFrame, cash_div: pd.DataFrame):
             mode="lines", name="Deposits (€)", line=dict(width=1, dash="dot")
         ))
 
+    # Per-account values, only worth a line each when there is more than one account
+    if account_history is not None and account_history["account"].nunique() > 1:
+        if selected_accounts is not None:
+            account_history = account_history[account_history["account"].isin(selected_accounts)]
+        for account, seg in account_history.groupby("account"):
+            seg_dates = _to_naive_series(seg["date"])
+            seg = seg.loc[seg_dates.index]
+            fig.add_trace(go.Scatter(
+                x=seg_dates, y=pd.to_numeric(seg["value"], errors="coerce"),
+                mode="lines", name=f"{account} (€)", line=dict(width=1)
+            ))
+
     fig.update_layout(
         title="📈 Historic Portfolio Overview",
         xaxis_title="Date",